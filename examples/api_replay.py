@@ -0,0 +1,158 @@
+import base64
+import hashlib
+import json
+import re
+import threading
+import time
+from collections import defaultdict
+from pathlib import Path
+from urllib.parse import parse_qsl, urlencode
+
+import requests
+from requests.structures import CaseInsensitiveDict
+
+from instrumentation import response_size
+
+"""
+This module can record the API calls made by the SDK to a fixture file and replay them later on,
+so that the example scripts can be run and measured without a VaultSpeed environment.
+It works at the transport level (requests.Session.send), so it does not depend on the internals of the Client.
+
+Calls are matched on their method, URL and body. When the same call was recorded multiple times, like the status checks
+of an agent task, the recorded responses are returned in the same order, the last one is repeated after that.
+
+Fixtures are meant to be shared, so tokens, cookies and other credentials are redacted before they are written.
+Request headers are never recorded, and the bodies of requests are only stored as a hash, which is taken after the credentials
+in the body (e.g. the password of the login request) are redacted, so the hash can't be used to guess them.
+"""
+
+REDACTED = "<redacted>"
+SENSITIVE_HEADERS = {"authorization", "proxy-authorization", "set-cookie", "cookie", "www-authenticate"}
+SENSITIVE_FIELD = re.compile(r"token|password|secret|cookie|session|authorization|credential", re.IGNORECASE)
+
+
+def _body(request: requests.PreparedRequest) -> bytes:
+    body = request.body or b""
+    return body.encode() if isinstance(body, str) else body
+
+
+def _key(request: requests.PreparedRequest) -> str:
+    body = _body(request)
+    if "application/x-www-form-urlencoded" in request.headers.get("Content-Type", ""):
+        body = urlencode([(k, REDACTED if SENSITIVE_FIELD.search(k) else v) for k, v in parse_qsl(body.decode())]).encode()
+    else:
+        body = _redact_content(body)
+    return f"{request.method} {request.url} {hashlib.sha256(body).hexdigest()}"
+
+
+def _redacted_value(value):
+    # the redacted value has the same JSON type as the original one, so the SDK can still parse a replayed response
+    if isinstance(value, str):
+        return REDACTED
+    if isinstance(value, (int, float)) and not isinstance(value, bool):
+        return type(value)()
+    return value
+
+
+def _redact(value):
+    if isinstance(value, dict):
+        return {k: _redacted_value(v) if SENSITIVE_FIELD.search(k) else _redact(v) for k, v in value.items()}
+    if isinstance(value, list):
+        return [_redact(v) for v in value]
+    return value
+
+
+def _redact_content(content: bytes) -> bytes:
+    # the login response contains the access and refresh tokens, those fields are replaced in every JSON response
+    try:
+        data = json.loads(content)
+    except ValueError:
+        return content
+    redacted = _redact(data)
+    return content if redacted == data else json.dumps(redacted).encode()
+
+
+class ApiRecorder:
+    def __init__(self, fixture: Path = None, replay: bool = False, latency: float = 0.0):
+        """
+        :param fixture: file to store the recorded calls in, or to replay them from. Without a fixture, the calls are only counted.
+        :param replay: replay the calls from the fixture instead of sending them to the API.
+        :param latency: number of seconds to wait before returning a replayed response, to simulate the network.
+        """
+        self.fixture = fixture
+        self.replay = replay
+        self.latency = latency
+        self.requests = 0
+        self.bytes_sent = 0
+        self.bytes_received = 0
+        self._interactions = defaultdict(list)
+        self._replayed = defaultdict(int)
+        self._lock = threading.Lock()
+        self._original_send = None
+
+        if replay:
+            self._interactions.update(json.loads(fixture.read_text()))
+
+    def __enter__(self):
+        self._original_send = requests.Session.send
+        recorder = self
+
+        def send(session, request, **kwargs):
+            return recorder.send(session, request, **kwargs)
+
+        requests.Session.send = send
+        return self
+
+    def __exit__(self, exc_type, exc_val, exc_tb):
+        requests.Session.send = self._original_send
+        if self.fixture and not self.replay:
+            self.fixture.write_text(json.dumps(self._interactions, indent=1))
+
+    def send(self, session, request: requests.PreparedRequest, **kwargs) -> requests.Response:
+        key = _key(request)
+        if self.replay:
+            response = self._replay(key, request)
+        else:
+            response = self._original_send(session, request, **kwargs)
+            self._record(key, response)
+
+        with self._lock:
+            self.requests += 1
+            self.bytes_sent += len(_body(request))
+            self.bytes_received += response_size(response, kwargs.get("stream", False) and not self.fixture)
+        return response
+
+    def _record(self, key: str, response: requests.Response):
+        # recording needs the whole body, so streamed responses are only read when there is a fixture to write to
+        if not self.fixture:
+            return
+        with self._lock:
+            self._interactions[key].append({
+                "status_code": response.status_code,
+                "reason": response.reason,
+                "headers": {k: REDACTED if k.lower() in SENSITIVE_HEADERS else v for k, v in response.headers.items()},
+                "content": base64.b64encode(_redact_content(response.content)).decode()
+            })
+
+    def _replay(self, key: str, request: requests.PreparedRequest) -> requests.Response:
+        with self._lock:
+            interactions = self._interactions.get(key)
+            if not interactions:
+                raise KeyError(f"No recorded response for {request.method} {request.url}")
+            index = min(self._replayed[key], len(interactions) - 1)
+            self._replayed[key] += 1
+        interaction = interactions[index]
+
+        if self.latency:
+            time.sleep(self.latency)
+
+        response = requests.Response()
+        response.status_code = interaction["status_code"]
+        response.reason = interaction["reason"]
+        response.headers = CaseInsensitiveDict(interaction["headers"])
+        response._content = base64.b64decode(interaction["content"])
+        response._content_consumed = True
+        response.encoding = requests.utils.get_encoding_from_headers(response.headers)
+        response.url = request.url
+        response.request = request
+        return response
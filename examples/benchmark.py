@@ -0,0 +1,128 @@
+import argparse
+import json
+import runpy
+import sys
+import time
+import tracemalloc
+from pathlib import Path
+
+from api_replay import ApiRecorder
+from instrumentation import Instrumentation
+
+"""
+This script runs one of the example scripts (or the code cells of a notebook) and reports how long it took,
+how many API calls it made, how many bytes were transferred and the peak memory usage, as well as the metrics per endpoint.
+Combined with a recorded fixture, this allows you to compare the number of API calls between SDK versions without
+a VaultSpeed environment, e.g.:
+
+python benchmark.py --record fmc.json fmc_setup.py moto moto_sf
+python benchmark.py --replay fmc.json --latency 0.05 --output result.json fmc_setup.py moto moto_sf
+python benchmark.py --replay fmc.json --baseline result.json fmc_setup.py moto moto_sf
+"""
+
+
+def run_script(script: Path, script_args: list):
+    if script.suffix == ".ipynb":
+        notebook = json.loads(script.read_text())
+        code = "\n".join("".join(cell["source"]) for cell in notebook["cells"] if cell["cell_type"] == "code")
+        exec(compile(code, str(script), "exec"), {"__name__": "__main__"})
+    else:
+        sys.argv = [str(script)] + script_args
+        runpy.run_path(str(script), run_name="__main__")
+
+
+def main(script: Path, script_args: list, record: Path = None, replay: Path = None, latency: float = 0.0, output: Path = None,
+         baseline: Path = None, metrics: Path = None):
+    tracemalloc.start()
+    start = time.perf_counter()
+    with ApiRecorder(fixture=replay or record, replay=bool(replay), latency=latency) as recorder, Instrumentation() as instrumentation:
+        run_script(script, script_args)
+    wall_time = time.perf_counter() - start
+    _, peak_memory = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+
+    result = {
+        "script": script.name,
+        "wall_time": round(wall_time, 3),
+        "requests": recorder.requests,
+        "bytes_sent": recorder.bytes_sent,
+        "bytes_received": recorder.bytes_received,
+        "peak_memory": peak_memory
+    }
+    for k, v in result.items():
+        print(f"{k}: {v}")
+    print(instrumentation.report())
+    result["endpoints"] = instrumentation.snapshot()
+
+    if metrics:
+        metrics.write_text(instrumentation.to_prometheus())
+
+    if output:
+        output.write_text(json.dumps(result, indent=1))
+
+    if baseline:
+        expected = json.loads(baseline.read_text())
+        if result["requests"] > expected["requests"]:
+            print(f"Regression: {result['requests']} API calls, the baseline only needed {expected['requests']}")
+            sys.exit(1)
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(
+        prog="benchmark",
+        description="""
+        Runs an example script or notebook and reports the wall time, the number of API calls, the bytes transferred and the peak memory.
+        The API calls can be recorded to a fixture file, and replayed from it later on without a VaultSpeed environment.
+        """
+    )
+    parser.add_argument(
+        "script",
+        help="path to the example script or notebook to run",
+        type=Path
+    )
+    parser.add_argument(
+        "script_args",
+        help="arguments passed on to the script",
+        nargs=argparse.REMAINDER
+    )
+    mode = parser.add_mutually_exclusive_group()
+    mode.add_argument(
+        "-r", "--record",
+        help="Record the API calls to this fixture file",
+        dest="record",
+        type=Path
+    )
+    mode.add_argument(
+        "-p", "--replay",
+        help="Replay the API calls from this fixture file instead of calling the API",
+        dest="replay",
+        type=Path
+    )
+    parser.add_argument(
+        "-l", "--latency",
+        help="Number of seconds added to every replayed API call",
+        dest="latency",
+        type=float,
+        default=0.0
+    )
+    parser.add_argument(
+        "-o", "--output",
+        help="Store the results in this JSON file",
+        dest="output",
+        type=Path
+    )
+    parser.add_argument(
+        "-b", "--baseline",
+        help="JSON file with the results of a previous run, the benchmark fails when more API calls are made than in this run",
+        dest="baseline",
+        type=Path
+    )
+    parser.add_argument(
+        "-m", "--metrics",
+        help="Store the metrics per endpoint in this file, in the Prometheus text format",
+        dest="metrics",
+        type=Path
+    )
+    args = parser.parse_args()
+
+    main(args.script, args.script_args, args.record, args.replay, args.latency, args.output, args.baseline, args.metrics)
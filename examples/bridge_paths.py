@@ -0,0 +1,254 @@
+import argparse
+import logging
+import os
+import threading
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor
+from typing import Dict, List, Set, Tuple
+
+from vaultspeed_sdk.business_vault.pit import FrequencyType, PitType, TimestampColumnTypes
+from vaultspeed_sdk.client import Client, UserPasswordAuthentication
+from vaultspeed_sdk.models.util import get_last
+from vaultspeed_sdk.system import System
+
+"""
+This script builds a graph of the hubs and links of a Data Vault release, and uses it to find the paths between hubs.
+The paths can be used directly to create bridges or PITs, instead of looking up the adjacent objects hub by hub.
+The adjacent objects of each hub are only retrieved once, and when the full graph is needed, they are retrieved concurrently.
+"""
+
+
+def _name(item) -> str:
+    return item if isinstance(item, str) else item.name
+
+
+class DvGraph:
+    def __init__(self, dv_objects, hubs: Set[str]):
+        self.dv_objects = dv_objects
+        self.hubs = hubs
+        self._adjacent: Dict[str, List[Tuple[str, str]]] = {}
+        self._lock = threading.Lock()
+
+    def adjacent(self, hub: str) -> List[Tuple[str, str]]:
+        # list of (link, hub) tuples for all the hubs connected to this hub
+        if hub not in self._adjacent:
+            neighbours = [(_name(link), _name(other)) for link, other in self.dv_objects[hub].get_adjacent_objects()]
+            with self._lock:
+                self._adjacent[hub] = neighbours
+        return self._adjacent[hub]
+
+    def load(self, max_workers: int = 8):
+        # retrieve the adjacent objects of all hubs at once, this is needed for the connected components
+        with ThreadPoolExecutor(max_workers=max_workers) as executor:
+            list(executor.map(self.adjacent, self.hubs))
+
+    def shortest_path(self, start: str, end: str) -> List[str]:
+        # breadth first search, the path alternates between hubs and links: [hub, link, hub, link, hub]
+        previous = {start: None}
+        queue = deque([start])
+        while queue:
+            hub = queue.popleft()
+            if hub == end:
+                path = [end]
+                while previous[path[-1]]:
+                    link, prev_hub = previous[path[-1]]
+                    path += [link, prev_hub]
+                return path[::-1]
+            for link, other in self.adjacent(hub):
+                if other not in previous:
+                    previous[other] = (link, hub)
+                    queue.append(other)
+        return []
+
+    def all_paths(self, start: str, end: str, max_hops: int = 4) -> List[List[str]]:
+        paths = []
+        stack = [[start]]
+        while stack:
+            path = stack.pop()
+            if path[-1] == end:
+                paths.append(path)
+                continue
+            if len(path) // 2 >= max_hops:
+                continue
+            for link, other in self.adjacent(path[-1]):
+                if other not in path[::2]:
+                    stack.append(path + [link, other])
+        return sorted(paths, key=len)
+
+    def neighbourhood(self, hub: str, hops: int = 1) -> Set[str]:
+        found = {hub}
+        frontier = {hub}
+        for _ in range(hops):
+            frontier = {other for h in frontier for _, other in self.adjacent(h)} - found
+            found |= frontier
+        return found - {hub}
+
+    def connected_components(self, max_workers: int = 8) -> List[Set[str]]:
+        self.load(max_workers)
+        components = []
+        remaining = set(self._adjacent)
+        while remaining:
+            component = {remaining.pop()}
+            component |= self.neighbourhood(next(iter(component)), hops=len(self._adjacent))
+            remaining -= component
+            components.append(component)
+        return sorted(components, key=len, reverse=True)
+
+    def objects(self, path: List[str]) -> list:
+        # the DV objects of a path, in the order expected by bv_release.create_bridge, they can also be used as the tables of a PIT
+        return [self.dv_objects[name] for name in path]
+
+
+def main(project: str, dv: str, start: str = None, end: str = None, dv_release_name: str = None, bv_release_name: str = None,
+         all_paths: bool = False, max_hops: int = 4, neighbours: int = None, components: bool = False, bridge_name: str = None,
+         pit_name: str = None, max_workers: int = 8, system: System = None):
+    # initialise VaultSpeed connection
+    logging.basicConfig(level=logging.INFO)
+    if not system:
+        auth = UserPasswordAuthentication(api_url=os.environ.get("VS_URL"), username=os.environ.get("VS_USER"), password=os.environ.get("VS_PASSWORD"))
+        client = Client(base_url=os.environ.get("VS_URL"), auth=auth, retries=1, caller="examples")
+        system = System(client=client)
+
+    data_vault = system.get_project(project).get_data_vault(name=dv)
+    if dv_release_name:
+        dv_release = data_vault.get_release(dv_release_name)
+    else:
+        dv_release = get_last([rel for rel in data_vault.releases if rel.locked])
+    print(f"Using DV release: {dv_release.name}")
+
+    # the hubs are taken from the hub groups of the release, so this does not depend on the naming conventions
+    hubs = set(dv_release.grouped_hubs.keys()) | set(dv_release.ungrouped_hubs.keys())
+    graph = DvGraph(dv_release.objects, hubs)
+
+    if components:
+        for i, component in enumerate(graph.connected_components(max_workers)):
+            print(f"component {i + 1} ({len(component)} hubs): {', '.join(sorted(component))}")
+        return
+
+    if neighbours is not None:
+        print(f"hubs within {neighbours} links of {start}: {', '.join(sorted(graph.neighbourhood(start, neighbours)))}")
+        return
+
+    paths = graph.all_paths(start, end, max_hops) if all_paths else [graph.shortest_path(start, end)]
+    paths = [path for path in paths if path]
+    if not paths:
+        raise Exception(f"No path could be found between {start} and {end}")
+    for path in paths:
+        print(" -> ".join(path))
+
+    if bridge_name or pit_name:
+        if bv_release_name:
+            bv_release = dv_release.get_business_vault_release(bv_release_name)
+        else:
+            bv_release = get_last([rel for rel in dv_release.business_vault_releases if not rel.locked])
+
+    if bridge_name:
+        bridge = bv_release.create_bridge(name=bridge_name, objects=graph.objects(paths[0]), objects_with_bks=graph.objects([end]),
+                                          create_bridge_hk=True)
+        print(bridge.elements)
+
+    if pit_name:
+        # a daily snapshot PIT over all the hubs and links of the path
+        pit = bv_release.create_pit(name=pit_name, snapshot_frequency=1, frequency_type=FrequencyType.DAY, pit_type=PitType.SNAPSHOT,
+                                    timestamp_type=TimestampColumnTypes.LOAD_TIMESTAMP, tables=graph.objects(paths[0]))
+        print(pit)
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(
+        prog="bridge paths",
+        description="""
+        This script finds the paths between 2 hubs of a Data Vault release, and can create a bridge or a PIT for the shortest one.
+        It can also show the hubs around a hub (--neighbours), or how the hubs are split into groups that are not connected (--components).
+        If no DV release is specified, then the last locked one will be used.
+        The bridge or PIT is created in the specified BV release, or the last unlocked one.
+        """,
+        epilog=""
+    )
+    parser.add_argument(
+        "project",
+        help="Project name",
+    )
+    parser.add_argument(
+        "dv",
+        help="Data Vault name"
+    )
+    parser.add_argument(
+        "start",
+        help="name of the hub to start from",
+        nargs="?"
+    )
+    parser.add_argument(
+        "end",
+        help="name of the hub to end with",
+        nargs="?"
+    )
+    parser.add_argument(
+        "-a", "--all",
+        help="Show all the paths instead of only the shortest one",
+        dest="all_paths",
+        action="store_true",
+        default=False
+    )
+    parser.add_argument(
+        "-m", "--max-hops",
+        help="Maximum number of links in a path when showing all paths",
+        dest="max_hops",
+        action="store",
+        type=int,
+        default=4
+    )
+    parser.add_argument(
+        "-n", "--neighbours",
+        help="Show the hubs that are at most this number of links away from the start hub",
+        dest="neighbours",
+        action="store",
+        type=int
+    )
+    parser.add_argument(
+        "-c", "--components",
+        help="Show the groups of hubs that are connected to each other, this retrieves the adjacent objects of all hubs",
+        dest="components",
+        action="store_true",
+        default=False
+    )
+    parser.add_argument(
+        "--bridge",
+        help="Create a bridge with this name for the shortest path",
+        dest="bridge_name",
+        action="store"
+    )
+    parser.add_argument(
+        "--pit",
+        help="Create a daily snapshot PIT with this name for the hubs and links of the shortest path",
+        dest="pit_name",
+        action="store"
+    )
+    parser.add_argument(
+        "-d", "--dv",
+        help="Data Vault release name",
+        dest="dv_release_name",
+        action="store"
+    )
+    parser.add_argument(
+        "-b", "--bv",
+        help="Business Vault release name",
+        dest="bv_release_name",
+        action="store"
+    )
+    parser.add_argument(
+        "-w", "--workers",
+        help="Maximum number of concurrent API requests when retrieving the adjacent objects of all hubs",
+        dest="max_workers",
+        action="store",
+        type=int,
+        default=8
+    )
+    args = parser.parse_args()
+    if not args.components and not args.start:
+        parser.error("a start hub is required")
+    if not args.components and args.neighbours is None and not args.end:
+        parser.error("an end hub is required to find paths")
+
+    main(args.project, args.dv, args.start, args.end, args.dv_release_name, args.bv_release_name, args.all_paths, args.max_hops,
+         args.neighbours, args.components, args.bridge_name, args.pit_name, args.max_workers)
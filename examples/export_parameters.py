@@ -7,11 +7,13 @@ from vaultspeed_sdk.client import Client, UserPasswordAuthentication
 from vaultspeed_sdk.system import System
 
 
-def main(project: str, csv_path: Path):
-    auth = UserPasswordAuthentication(api_url=os.environ.get("VS_URL"), username=os.environ.get("VS_USER"),
-                                      password=os.environ.get("VS_PASSWORD"))
-    client = Client(base_url=os.environ.get("VS_URL"), auth=auth, retries=1, caller="examples")
-    system = System(client=client)
+def main(project: str, csv_path: Path, system: System = None):
+    # an existing session can be passed in, so that multiple jobs in the same process don't each have to log in
+    if not system:
+        auth = UserPasswordAuthentication(api_url=os.environ.get("VS_URL"), username=os.environ.get("VS_USER"),
+                                          password=os.environ.get("VS_PASSWORD"))
+        client = Client(base_url=os.environ.get("VS_URL"), auth=auth, retries=1, caller="examples")
+        system = System(client=client)
 
     p = system.get_project(project)
 
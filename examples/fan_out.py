@@ -0,0 +1,196 @@
+import argparse
+import logging
+import os
+import sys
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime, timezone
+from email.utils import parsedate_to_datetime
+from pathlib import Path
+from typing import Callable, Dict, Iterable, Tuple
+
+import requests
+from vaultspeed_sdk.client import Client, UserPasswordAuthentication
+from vaultspeed_sdk.system import System
+
+from instrumentation import Instrumentation
+
+"""
+This script runs the same job for many projects or data vaults at once, e.g. exporting the parameters of all projects.
+All jobs share a single authenticated session, and the API calls of all threads go through one rate limiter,
+so the jobs run as fast as the server allows without hitting its limits.
+When the server does answer with 429 Too Many Requests, all threads wait for the time given in the Retry-After header,
+after which the client retries the call as usual.
+
+Example:
+
+python fan_out.py export_parameters moto_1 moto_2 moto_3 -o exports
+python fan_out.py fmc_setup moto_1/moto_sf moto_2/moto_sf --dry-run
+"""
+
+
+class RateLimiter:
+    def __init__(self, rate: float, burst: int = None):
+        """
+        :param rate: average number of API calls per second.
+        :param burst: number of API calls that can be made at once after a quiet period, defaults to the rate.
+        """
+        self.rate = rate
+        self.burst = burst or max(1, int(rate))
+        self._tokens = float(self.burst)
+        self._updated = time.monotonic()
+        self._paused_until = 0.0
+        self._lock = threading.Lock()
+
+    def acquire(self, request: requests.PreparedRequest = None):
+        while True:
+            with self._lock:
+                now = time.monotonic()
+                self._tokens = min(self.burst, self._tokens + (now - self._updated) * self.rate)
+                self._updated = now
+                if now >= self._paused_until and self._tokens >= 1:
+                    self._tokens -= 1
+                    return
+                wait = max(self._paused_until - now, (1 - self._tokens) / self.rate)
+            time.sleep(wait)
+
+    def pause(self, seconds: float):
+        with self._lock:
+            self._paused_until = max(self._paused_until, time.monotonic() + seconds)
+            self._tokens = 0.0
+
+    def check_response(self, request: requests.PreparedRequest, response: requests.Response, duration: float):
+        if response is not None and response.status_code == 429:
+            self.pause(retry_after(response))
+
+
+def retry_after(response: requests.Response, default: float = 1.0) -> float:
+    # the Retry-After header is either a number of seconds or a date
+    value = response.headers.get("Retry-After")
+    if not value:
+        return default
+    try:
+        return float(value)
+    except ValueError:
+        try:
+            return max(0.0, (parsedate_to_datetime(value) - datetime.now(timezone.utc)).total_seconds())
+        except (TypeError, ValueError):
+            return default
+
+
+def fan_out(fn: Callable, targets: Iterable, system: System, max_workers: int = 8, rate: float = 10) -> Dict[object, Tuple[object, Exception]]:
+    # runs fn(target, system) for every target, and returns the result or the error of each target
+    limiter = RateLimiter(rate)
+    results = {}
+
+    def run(target):
+        try:
+            results[target] = (fn(target, system), None)
+        except Exception as e:
+            logging.exception(f"{target} failed")
+            results[target] = (None, e)
+
+    with Instrumentation() as instrumentation:
+        instrumentation.before_request.append(limiter.acquire)
+        instrumentation.after_request.append(limiter.check_response)
+        with ThreadPoolExecutor(max_workers=max_workers) as executor:
+            list(executor.map(run, targets))
+    print(instrumentation.report())
+    return results
+
+
+def export_parameters_job(output: Path) -> Callable:
+    import export_parameters
+
+    def job(project: str, system: System):
+        return export_parameters.main(project, output / f"{project}.csv", system=system)
+    return job
+
+
+def fmc_setup_job(dry_run: bool) -> Callable:
+    import fmc_setup
+
+    def job(target: str, system: System):
+        project, data_vault = target.split("/")
+        # the targets already run concurrently, so the flows of one target are synced one at a time
+        return fmc_setup.main(project, data_vault, dry_run=dry_run, system=system, max_workers=1)
+    return job
+
+
+def main(job: str, targets: list, output: Path, dry_run: bool = False, max_workers: int = 8, rate: float = 10):
+    # initialise VaultSpeed connection, this session is shared by all jobs
+    logging.basicConfig(level=logging.INFO)
+    auth = UserPasswordAuthentication(api_url=os.environ.get("VS_URL"), username=os.environ.get("VS_USER"), password=os.environ.get("VS_PASSWORD"))
+    client = Client(base_url=os.environ.get("VS_URL"), auth=auth, retries=1, caller="examples")
+    system = System(client=client)
+
+    if job == "export_parameters":
+        output.mkdir(parents=True, exist_ok=True)
+        fn = export_parameters_job(output)
+    else:
+        fn = fmc_setup_job(dry_run)
+
+    start = time.time()
+    results = fan_out(fn, targets, system, max_workers, rate)
+    failed = [target for target, (_, error) in results.items() if error]
+    print(f"{len(targets) - len(failed)} of {len(targets)} targets finished in {round(time.time() - start, 2)}s")
+    for target in failed:
+        print(f"  {target}: {results[target][1]}")
+    if failed:
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(
+        prog="fan out",
+        description="""
+        This script runs one of the example jobs for multiple targets concurrently, sharing one session and one rate limit.
+        The targets are project names for export_parameters, and project/data vault names for fmc_setup.
+        """,
+        epilog=""
+    )
+    parser.add_argument(
+        "job",
+        help="the job to run for each target",
+        choices=["export_parameters", "fmc_setup"]
+    )
+    parser.add_argument(
+        "targets",
+        help="the targets to run the job for",
+        metavar="target",
+        nargs="+"
+    )
+    parser.add_argument(
+        "-o", "--output",
+        help="Directory to store the parameter exports in",
+        dest="output",
+        type=Path,
+        default=Path(".")
+    )
+    parser.add_argument(
+        "-n", "--dry-run",
+        help="Only show the FMC changes, without applying them",
+        dest="dry_run",
+        action="store_true",
+        default=False
+    )
+    parser.add_argument(
+        "-w", "--workers",
+        help="Maximum number of targets that are processed at the same time",
+        dest="max_workers",
+        action="store",
+        type=int,
+        default=8
+    )
+    parser.add_argument(
+        "-r", "--rate",
+        help="Maximum number of API calls per second, over all targets",
+        dest="rate",
+        action="store",
+        type=float,
+        default=10
+    )
+    args = parser.parse_args()
+
+    main(args.job, args.targets, args.output, args.dry_run, args.max_workers, args.rate)
@@ -1,7 +1,9 @@
 import argparse
 import logging
 import os
+from concurrent.futures import ThreadPoolExecutor
 from datetime import datetime, timezone
+from typing import Dict, List
 
 from vaultspeed_sdk.client import Client, UserPasswordAuthentication
 from vaultspeed_sdk.fmc import FlowTypes
@@ -11,34 +13,24 @@ from vaultspeed_sdk.system import System
 """
 This script can create FMC flows for a Data Vault, this is useful when you have a lot of sources, 
 so that you don't have to create an init and incr flow for each of them.
+Flows that already exist are updated in place instead of being recreated, so that they keep their generations.
 """
 
+# properties that can be updated on an existing flow, when one of the RECREATE_PROPERTIES differs the flow is deleted and created again
+UPDATABLE_PROPERTIES = ["description", "concurrency", "group_tasks", "dv_connection_name", "src_connection_name", "schedule_interval"]
+RECREATE_PROPERTIES = ["flow_type", "load_type"]
 
-def main(project_name: str, data_vault_name: str):
-    """
-     Preparation
-    """
-    logging.basicConfig(level=logging.INFO)
-    auth = UserPasswordAuthentication(api_url=os.environ.get("VS_URL"), username=os.environ.get("VS_USER"),
-                                      password=os.environ.get("VS_PASSWORD"))
-    client = Client(base_url=os.environ.get("VS_URL"), auth=auth, retries=1, caller="examples")
-    system = System(client=client)
-    project = system.get_project(project_name)
-    data_vault = project.get_data_vault(name=data_vault_name)
 
-    for flow in data_vault.fmc_flows:
-        data_vault.delete_fmc_flow(flow)
-
-    """
-     create FMC flows
-    """
+def desired_flows(project, data_vault) -> List[Dict]:
+    start_date = datetime.now(timezone.utc).replace(minute=0, hour=0, second=0, microsecond=0)
+    specs = []
     for load_type in [LoadTypes.INIT, LoadTypes.INCR]:
         for source in project.sources:
             if source.build_flag:
-                data_vault.create_fmc_flow(
+                specs.append(dict(
                     name=f"{source.name}_{load_type.value.lower()}",
                     description=f"{source.name}_{load_type.value.lower()}",
-                    start_date=datetime.now(timezone.utc).replace(minute=0, hour=0, second=0, microsecond=0),
+                    start_date=start_date,
                     concurrency=4,
                     flow_type=FlowTypes.FL,
                     load_type=load_type,
@@ -47,21 +39,88 @@ def main(project_name: str, data_vault_name: str):
                     source=source,
                     schedule_interval="\"@hourly\"",
                     src_connection_name="src"
-                )
+                ))
 
-        data_vault.create_fmc_flow(
+        specs.append(dict(
             name=f"{data_vault.code}_bv_{load_type.value.lower()}",
             description=f"{data_vault.code}_bv_{load_type.value.lower()}",
-            start_date=datetime.now(timezone.utc).replace(minute=0, hour=0, second=0, microsecond=0),
+            start_date=start_date,
             concurrency=4,
             flow_type=FlowTypes.BV,
             load_type=load_type,
             group_tasks=False,
             dv_connection_name="dv",
             schedule_interval="timedelta(hours=1)"
-        )
+        ))
+    return specs
+
+
+def update_flow(flow, changes: Dict):
+    for prop, value in changes.items():
+        setattr(flow, prop, value)
+
+
+def sync_fmc_flows(data_vault, specs: List[Dict], dry_run: bool = False, max_workers: int = 8):
+    existing = {flow.name: flow for flow in data_vault.fmc_flows}
+    wanted = {spec["name"]: spec for spec in specs}
+
+    to_delete = [flow for name, flow in existing.items() if name not in wanted]
+    to_create = [spec for name, spec in wanted.items() if name not in existing]
+    to_update = {}
+    for name, spec in wanted.items():
+        flow = existing.get(name)
+        if flow is None:
+            continue
+        if any(getattr(flow, prop) != spec[prop] for prop in RECREATE_PROPERTIES if prop in spec):
+            to_delete.append(flow)
+            to_create.append(spec)
+            continue
+        changes = {prop: spec[prop] for prop in UPDATABLE_PROPERTIES if prop in spec and getattr(flow, prop) != spec[prop]}
+        if changes:
+            to_update[name] = changes
+
+    for flow in to_delete:
+        print(f"delete {flow.name}")
+    for spec in to_create:
+        print(f"create {spec['name']}")
+    for name, changes in to_update.items():
+        print(f"update {name}: {changes}")
+    print(f"{len(to_create)} to create, {len(to_update)} to update, {len(to_delete)} to delete, "
+          f"{len(wanted) - len(to_create) - len(to_update)} unchanged")
 
-    print(data_vault.fmc_flows)
+    if dry_run:
+        return
+
+    # the deletes go first, since a recreated flow reuses the name of the deleted one
+    with ThreadPoolExecutor(max_workers=max_workers) as executor:
+        list(executor.map(data_vault.delete_fmc_flow, to_delete))
+    with ThreadPoolExecutor(max_workers=max_workers) as executor:
+        futures = [executor.submit(update_flow, existing[name], changes) for name, changes in to_update.items()]
+        futures += [executor.submit(data_vault.create_fmc_flow, **spec) for spec in to_create]
+    for future in futures:
+        future.result()
+
+
+def main(project_name: str, data_vault_name: str, dry_run: bool = False, system: System = None, max_workers: int = 8):
+    """
+     Preparation
+    """
+    logging.basicConfig(level=logging.INFO)
+    if not system:
+        auth = UserPasswordAuthentication(api_url=os.environ.get("VS_URL"), username=os.environ.get("VS_USER"),
+                                          password=os.environ.get("VS_PASSWORD"))
+        client = Client(base_url=os.environ.get("VS_URL"), auth=auth, retries=1, caller="examples")
+        system = System(client=client)
+    project = system.get_project(project_name)
+    data_vault = project.get_data_vault(name=data_vault_name)
+
+    """
+     create, update or delete the FMC flows that differ from the desired ones
+    """
+    sync_fmc_flows(data_vault, desired_flows(project, data_vault), dry_run=dry_run, max_workers=max_workers)
+
+    if not dry_run:
+        print(data_vault.fmc_flows)
 
 
 if __name__ == "__main__":
@@ -80,6 +139,13 @@ if __name__ == "__main__":
         "data_vault",
         help="Name of the Data Vault"
     )
+    parser.add_argument(
+        "-n", "--dry-run",
+        help="Only print the changes that would be made to the flows",
+        dest="dry_run",
+        action="store_true",
+        default=False
+    )
     args = parser.parse_args()
 
-    main(args.project, args.data_vault)
+    main(args.project, args.data_vault, args.dry_run)
@@ -1,8 +1,16 @@
 import argparse
+import hashlib
+import json
 import logging
 import os
+import shutil
+import tempfile
+import time
+import uuid
+from collections import defaultdict
+from concurrent.futures import ThreadPoolExecutor, as_completed
 from pathlib import Path
-from typing import List
+from typing import Dict, List, Optional, Tuple
 
 from vaultspeed_sdk.exceptions.internal_server_error import InternalServerError
 from vaultspeed_sdk.client import Client, UserPasswordAuthentication, TaskConfig
@@ -13,19 +21,66 @@ from vaultspeed_sdk.models.metadata.load_type import LoadTypes
 from vaultspeed_sdk.models.util import get_last
 from vaultspeed_sdk.system import System
 
+# number of seconds before a file in the cache that isn't used by any generation can be removed,
+# another process can still be writing the manifest of the generation that uses it
+CACHE_GRACE_PERIOD = 3600
+
+
+def index_generations(generations: List[Generation]) -> Tuple[Dict[Tuple[int, GenerationTypes], List[Generation]], Dict[str, List[Generation]]]:
+    # build the lookup tables in a single pass over the generation history, so that each lookup afterwards doesn't have to scan it again
+    by_release = defaultdict(list)
+    by_filename = defaultdict(list)
+    for gen in generations:
+        by_release[(gen.bv_identifier, gen.gen_type)].append(gen)
+        by_filename[gen.filename].append(gen)
+    return by_release, by_filename
+
+
+def run_task(description: str, task, *args, **kwargs):
+    # run an agent task and report how long it took as soon as it is done, instead of after all tasks have finished,
+    # tasks that return None did not start anything (e.g. an FMC flow without a matching ETL generation) so they are not reported
+    start = time.monotonic()
+    result = task(*args, **kwargs)
+    if result is not None:
+        print(f"{description} finished in {time.monotonic() - start:.1f}s")
+    return result
+
+
+def generate_fmc(flow, etl_generation_id: int) -> Optional[Generation]:
+    etl_generations = [gen for gen in flow.etl_generations if gen.generation_id == etl_generation_id]
+    if not etl_generations:
+        print(f"No valid ETL generations where found for FMC workflow {flow.name}")
+        return None
+    return flow.generate(get_last(etl_generations))
+
 
 def generate_code(system: System, project_name: str, dv_name: str, generation_type: EtlGenerationTypes, dv_release_name: str = None,
-                  bv_release_name: str = None, force_generation: bool = False) -> List[Generation]:
+                  bv_release_name: str = None, force_generation: bool = False, max_workers: int = 8) -> List[Generation]:
     data_vault = system.get_project(project_name).get_data_vault(name=dv_name)
 
+    # The releases, the generation history and the FMC flows don't depend on each other, so fetch them concurrently.
+    # When a DV release is requested, only that release is fetched up front, the list of releases is only needed later for the production check.
+    # All threads share the client of the given System, with max_workers=1 every API call is made one after the other.
+    with ThreadPoolExecutor(max_workers=max_workers) as executor:
+        if dv_release_name:
+            dv_release_future = executor.submit(data_vault.get_release, dv_release_name)
+        else:
+            dv_releases_future = executor.submit(lambda: data_vault.releases)
+        all_generations_future = executor.submit(system.generations)
+        fmc_flows_future = executor.submit(lambda: data_vault.fmc_flows)
+    generations_by_release, generations_by_filename = index_generations(all_generations_future.result())
+    fmc_flows = fmc_flows_future.result()
+
     # get requested releases or the latest one if none are specified
     if dv_release_name:
-        dv_release = data_vault.get_release(dv_release_name)
+        dv_release = dv_release_future.result()
+        dv_releases = data_vault.releases
         if not dv_release.locked:
             raise Exception("The selected Data Vault release is not yet locked and thus cannot be used to generate code")
         print(f"Generating for select DV release: {dv_release.name}")
     else:
-        locked_dv_releases = [rel for rel in data_vault.releases if rel.locked]
+        dv_releases = dv_releases_future.result()
+        locked_dv_releases = [rel for rel in dv_releases if rel.locked]
         if not locked_dv_releases:
             raise Exception("No locked Data Vault releases could be found in the selected project")
 
@@ -46,9 +101,7 @@ def generate_code(system: System, project_name: str, dv_name: str, generation_ty
 
     # Check if there are production releases. If there are, then we will generate code using the delta generation.
     # We only look at releases which occurred before the selected release in case the selected release is a production release.
-    prod_releases = [rel for rel in data_vault.releases if not rel.prototype_flag and rel.date < dv_release.date]
-
-    all_generations = system.generations()
+    prod_releases = [rel for rel in dv_releases if not rel.prototype_flag and rel.date < dv_release.date]
 
     generations: List[Generation] = []
     etl_generation_id: int
@@ -60,25 +113,32 @@ def generate_code(system: System, project_name: str, dv_name: str, generation_ty
         etl_gen: Generation = None
 
         if not force_generation:
-            ddl_gen = get_last([gen for gen in all_generations if
-                                gen.gen_type == GenerationTypes.DDL and gen.bv_identifier == bv_release.identifier])
-            etl_gen = get_last([gen for gen in all_generations if
-                                gen.gen_type == GenerationTypes.ETL and gen.bv_identifier == bv_release.identifier])
-
-        if not ddl_gen:
-            print("Generating new DDL code")
-            ddl_gen = system.generate_ddl(
-                bv_release=bv_release,
-                etl_generation_type=generation_type,
-                load_type=LoadTypes.ALL
-            )[0]
-        if not etl_gen:
-            print("Generating new ETL code")
-            etl_gen = system.generate_etl(
-                bv_release=bv_release,
-                etl_generation_type=generation_type,
-                load_type=LoadTypes.ALL
-            )[0]
+            ddl_gen = get_last(generations_by_release.get((bv_release.identifier, GenerationTypes.DDL), []))
+            etl_gen = get_last(generations_by_release.get((bv_release.identifier, GenerationTypes.ETL), []))
+
+        # the DDL and ETL generations don't depend on each other, so both tasks are submitted at the same time
+        with ThreadPoolExecutor(max_workers=max_workers) as executor:
+            ddl_future = etl_future = None
+            if not ddl_gen:
+                print("Generating new DDL code")
+                ddl_future = executor.submit(
+                    run_task, "DDL generation", system.generate_ddl,
+                    bv_release=bv_release,
+                    etl_generation_type=generation_type,
+                    load_type=LoadTypes.ALL
+                )
+            if not etl_gen:
+                print("Generating new ETL code")
+                etl_future = executor.submit(
+                    run_task, "ETL generation", system.generate_etl,
+                    bv_release=bv_release,
+                    etl_generation_type=generation_type,
+                    load_type=LoadTypes.ALL
+                )
+        if ddl_future:
+            ddl_gen = ddl_future.result()[0]
+        if etl_future:
+            etl_gen = etl_future.result()[0]
 
         generations.append(ddl_gen)
         generations.append(etl_gen)
@@ -92,12 +152,12 @@ def generate_code(system: System, project_name: str, dv_name: str, generation_ty
 
         if not force_generation:
             # check if there was already a generation done before for the selected release that we can reuse
-            delta_gen = get_last([gen for gen in all_generations if
-                                  gen.gen_type == GenerationTypes.DELTA and gen.bv_identifier == bv_release.identifier])
+            delta_gen = get_last(generations_by_release.get((bv_release.identifier, GenerationTypes.DELTA), []))
 
         if not delta_gen:
             print("Generating new DELTA code")
-            delta_gen = system.generate_delta(
+            delta_gen = run_task(
+                "DELTA generation", system.generate_delta,
                 old_bv_release=prev_bv_release,
                 new_bv_release=bv_release,
                 etl_generation_type=generation_type
@@ -106,36 +166,165 @@ def generate_code(system: System, project_name: str, dv_name: str, generation_ty
         generations.append(delta_gen)
         etl_generation_id = delta_gen.identifier
 
-    # Generate FMC code
-    for flow in data_vault.fmc_flows:
-        print(f"Checking generations for Flow {flow.name}")
-        # check if there is a previous generation
-        fmc_generations = get_last([gen for gen in flow.generations if gen.etl_generation_id == etl_generation_id])
+    # Generate FMC code, the generations of all flows are retrieved concurrently up front,
+    # and the flows that need new code are all submitted before waiting on any of them
+    fmc_futures = []
+    with ThreadPoolExecutor(max_workers=max_workers) as executor:
+        flow_generations = list(executor.map(lambda f: f.generations, fmc_flows))
 
-        if fmc_generations and not force_generation:
-            # reuse existing generation
-            print("Found an existing FMC generation")
-            fmc_gen = get_last([gen for gen in all_generations if
-                                gen.gen_type == GenerationTypes.FMC and gen.filename == fmc_generations.file_name])
-            generations.append(fmc_gen)
+        for flow, flow_gens in zip(fmc_flows, flow_generations):
+            print(f"Checking generations for Flow {flow.name}")
+            # check if there is a previous generation
+            fmc_generations = get_last([gen for gen in flow_gens if gen.etl_generation_id == etl_generation_id])
+
+            if fmc_generations and not force_generation:
+                # reuse existing generation
+                print("Found an existing FMC generation")
+                fmc_gen = get_last([gen for gen in generations_by_filename.get(fmc_generations.file_name, [])
+                                    if gen.gen_type == GenerationTypes.FMC])
+                generations.append(fmc_gen)
 
-        else:
-            # generate FMC code for the ETL generation
-            print("Generating new FMC code")
-            etl_generations = [gen for gen in flow.etl_generations if gen.generation_id == etl_generation_id]
-            if etl_generations:
-                try:
-                    fmc_generation = flow.generate(get_last(etl_generations))
-                    generations.append(fmc_generation)
-                except InternalServerError as e:
-                    # If a flow is empty, and thus there is nothing to generate, then it raises an internal server error.
-                    print(e)
             else:
-                print("No valid ETL generations where found for this FMC workflow")
+                # generate FMC code for the ETL generation
+                print(f"Generating new FMC code for Flow {flow.name}")
+                fmc_futures.append(executor.submit(run_task, f"FMC generation for Flow {flow.name}", generate_fmc, flow, etl_generation_id))
+
+    for future in fmc_futures:
+        try:
+            fmc_generation = future.result()
+        except InternalServerError as e:
+            # If a flow is empty, and thus there is nothing to generate, then it raises an internal server error.
+            print(e)
+            continue
+        if fmc_generation:
+            generations.append(fmc_generation)
 
     return generations
 
 
+def file_hash(path: Path) -> str:
+    sha = hashlib.sha256()
+    with path.open("rb") as f:
+        for chunk in iter(lambda: f.read(1024 * 1024), b""):
+            sha.update(chunk)
+    return sha.hexdigest()
+
+
+def cache_generation(cache_dir: Path, gen: Generation, download_path: Path):
+    # download the generation and store its files in the cache, the manifest is written last so that an interrupted download is not used
+    # the temporary names are unique, so that other threads or processes (e.g. CI agents sharing the cache) never write to the same file
+    download_path.mkdir(parents=True)
+    gen.download_files_to(path=download_path, keep_zip=False)
+
+    manifest = {}
+    for file in sorted(download_path.rglob("*")):
+        if not file.is_file():
+            continue
+        sha = file_hash(file)
+        manifest[file.relative_to(download_path).as_posix()] = sha
+        cached_file = cache_dir / "objects" / sha
+        try:
+            # a file that is already in the cache is marked as recently used, so that it isn't evicted before the manifest is written
+            os.utime(cached_file)
+        except FileNotFoundError:
+            tmp_file = cached_file.with_name(f"{sha}.{uuid.uuid4().hex}.tmp")
+            shutil.move(file, tmp_file)
+            os.utime(tmp_file)
+            os.replace(tmp_file, cached_file)
+
+    manifest_path = cache_dir / "generations" / f"{gen.identifier}.json"
+    tmp_manifest_path = manifest_path.with_name(f"{gen.identifier}.{uuid.uuid4().hex}.tmp")
+    tmp_manifest_path.write_text(json.dumps(manifest, indent=1))
+    os.replace(tmp_manifest_path, manifest_path)
+
+
+def is_cached(cache_dir: Path, gen: Generation) -> bool:
+    manifest_path = cache_dir / "generations" / f"{gen.identifier}.json"
+    return manifest_path.is_file() and all((cache_dir / "objects" / sha).is_file() for sha in json.loads(manifest_path.read_text()).values())
+
+
+def evict_cache(cache_dir: Path, max_size: int):
+    # remove the least recently used generations until the files that are no longer referenced by any generation fit in max_size
+    manifests = sorted((cache_dir / "generations").glob("*.json"), key=lambda m: m.stat().st_mtime)
+    while True:
+        referenced = {sha for manifest in manifests for sha in json.loads(manifest.read_text()).values()}
+        # temporary files are left alone, they can belong to a download that is still running in another process,
+        # and so are recent files, those can belong to a generation of which the manifest isn't written yet
+        cached_files = [f for f in (cache_dir / "objects").iterdir() if f.suffix != ".tmp"]
+        for cached_file in cached_files:
+            if cached_file.name not in referenced and time.time() - cached_file.stat().st_mtime > CACHE_GRACE_PERIOD:
+                cached_file.unlink(missing_ok=True)
+        if not manifests or sum(f.stat().st_size for f in cached_files if f.name in referenced) <= max_size:
+            return
+        manifests.pop(0).unlink()
+
+
+def download_generations(generations: List[Generation], path: Path, max_workers: int = 8, cache_dir: Path = None, cache_size: int = None):
+    # The files of the generations are stored in a content-addressed cache: cache_dir/objects/<sha256> contains the files,
+    # and cache_dir/generations/<identifier>.json lists the files of a generation and their hashes.
+    # Generations that are already in the cache are not downloaded again, without a cache_dir a temporary cache is used.
+    with tempfile.TemporaryDirectory() as tmp_dir:
+        cache = cache_dir or Path(tmp_dir) / "cache"
+        (cache / "objects").mkdir(parents=True, exist_ok=True)
+        (cache / "generations").mkdir(parents=True, exist_ok=True)
+
+        missing = [gen for gen in generations if not is_cached(cache, gen)]
+        with ThreadPoolExecutor(max_workers=max_workers) as executor:
+            list(executor.map(lambda gen: cache_generation(cache, gen, Path(tmp_dir) / "downloads" / str(gen.identifier)), missing))
+
+        # The generations are processed in their original order, so a later generation still overwrites the files of an earlier one.
+        # The final content of every file is known up front, so each target file is only compared and written once.
+        files = {}
+        for gen in generations:
+            manifest_path = cache / "generations" / f"{gen.identifier}.json"
+            os.utime(manifest_path)
+            files.update(json.loads(manifest_path.read_text()))
+
+        # Files that have the same content as the ones already in the target folder are skipped, so that they keep their timestamps,
+        # the others are copied from the cache. They are not hard linked, since editing a linked file in place would also change the cache.
+        updated, unchanged = 0, 0
+        for relative_path, sha in files.items():
+            cached_file = cache / "objects" / sha
+            target = path / relative_path
+            if target.is_file() and target.stat().st_size == cached_file.stat().st_size and file_hash(target) == sha:
+                unchanged += 1
+                continue
+            target.parent.mkdir(parents=True, exist_ok=True)
+            target.unlink(missing_ok=True)
+            shutil.copy2(cached_file, target)
+            updated += 1
+
+        if cache_dir and cache_size:
+            evict_cache(cache_dir, cache_size)
+
+    print(f"Retrieved {len(generations)} generations in {path}, {len(missing)} downloaded and {len(generations) - len(missing)} from the cache: "
+          f"{updated} files updated, {unchanged} files unchanged")
+
+
+def deploy_generations(generations: List[Generation], db_link, max_parallel: int = 4):
+    # The DDL has to be deployed before the ETL, and the ETL before the FMC code, deltas are deployed one by one in release order.
+    # A delta is always generated after the release it is based on, so the order of the generation identifiers is the release order.
+    # Generations within the same stage don't depend on each other, so those are deployed at the same time.
+    deployable = [gen for gen in generations if gen.can_autodeploy]
+    stages = [[gen for gen in deployable if gen.gen_type == GenerationTypes.DDL],
+              [gen for gen in deployable if gen.gen_type == GenerationTypes.ETL]]
+    stages += [[gen] for gen in sorted((gen for gen in deployable if gen.gen_type == GenerationTypes.DELTA), key=lambda gen: gen.identifier)]
+    stages.append([gen for gen in deployable if gen.gen_type not in (GenerationTypes.DDL, GenerationTypes.ETL, GenerationTypes.DELTA)])
+
+    with ThreadPoolExecutor(max_workers=max_parallel) as executor:
+        for stage in stages:
+            futures = [executor.submit(run_task, f"Deployment of {gen.gen_type.name} generation {gen.identifier}", gen.deploy_to_target,
+                                       db_link=db_link) for gen in stage]
+            try:
+                for future in as_completed(futures):
+                    future.result()
+            except Exception:
+                # stop at the first failed deployment, since the next stages depend on it
+                for future in futures:
+                    future.cancel()
+                raise
+
+
 def main():
     parser = argparse.ArgumentParser(
         prog="Generate",
@@ -178,6 +367,21 @@ def main():
         action="store",
         type=Path
     )
+    parser.add_argument(
+        "-c", "--cache-dir",
+        help="Directory where downloaded generations are cached, so that they don't have to be downloaded again in the next run",
+        dest="cache_dir",
+        action="store",
+        type=Path
+    )
+    parser.add_argument(
+        "--cache-size",
+        help="Maximum size of the cache in MB, the least recently used generations are removed from the cache first",
+        dest="cache_size",
+        action="store",
+        type=int,
+        default=1024
+    )
     parser.add_argument(
         "-l", "--deploy", "--link",
         help="The name of the link that should be used to deploy the generated code",
@@ -196,6 +400,23 @@ def main():
         dest="bv_release",
         action="store"
     )
+    parser.add_argument(
+        "-w", "--workers",
+        help="Maximum number of concurrent API requests and generation tasks",
+        dest="max_workers",
+        action="store",
+        type=int,
+        default=8
+    )
+    parser.add_argument(
+        "-i", "--polling-interval",
+        help="Number of seconds between two status checks of a running generation task, "
+             "a lower value (e.g. 2) notices short tasks sooner at the cost of more status requests",
+        dest="polling_interval",
+        action="store",
+        type=int,
+        default=10
+    )
     args = parser.parse_args()
 
     # initialise VaultSpeed connection
@@ -203,23 +424,22 @@ def main():
     auth = UserPasswordAuthentication(api_url=os.environ.get("VS_URL"), username=os.environ.get("VS_USER"),
                                       password=os.environ.get("VS_PASSWORD"))
     client = Client(base_url=os.environ.get("VS_URL"), auth=auth, retries=1, caller="examples",
-                    task_config=TaskConfig(polling_interval=10, timeout=0, queue_timeout=600, show_progress=True))
+                    task_config=TaskConfig(polling_interval=args.polling_interval, timeout=0, queue_timeout=600, show_progress=True))
     system = System(client=client)
 
     generations = generate_code(system=system, project_name=args.project, dv_name=args.dv, generation_type=args.generation_type,
-                                dv_release_name=args.dv_release, bv_release_name=args.bv_release, force_generation=args.force_generation)
+                                dv_release_name=args.dv_release, bv_release_name=args.bv_release, force_generation=args.force_generation,
+                                max_workers=args.max_workers)
 
     if args.code_target_path:
         # retrieve the generated files and store them locally
-        for gen in generations:
-            gen.download_files_to(path=args.code_target_path, keep_zip=False)
+        download_generations(generations, path=args.code_target_path, max_workers=args.max_workers, cache_dir=args.cache_dir,
+                             cache_size=args.cache_size * 1024 * 1024)
 
     if args.deploy_link:
         # deploy the generated files
         db_link = system.get_database_link(args.deploy_link)
-        for gen in generations:
-            if gen.can_autodeploy:
-                gen.deploy_to_target(db_link=db_link)
+        deploy_generations(generations, db_link=db_link, max_parallel=args.max_workers)
 
 
 if __name__ == "__main__":
@@ -2,6 +2,7 @@
 import argparse
 import logging
 import os
+from collections import defaultdict
 from pathlib import Path
 import csv
 
@@ -10,12 +11,22 @@ from vaultspeed_sdk.models.util import get_last
 from vaultspeed_sdk.system import System
 
 
-def main(project: str, dv: str, csv_path: Path, dv_release_name: str = None, bv_release_name: str = None):
+def assign_signatures(item, signatures: list):
+    # assign all the new signatures of an object or attribute in one go, instead of one call per signature
+    current = list(item.signatures)
+    new = [signature for signature in signatures if signature not in current]
+    if new:
+        item.signatures = current + new
+
+
+def main(project: str, dv: str, csv_path: Path, dv_release_name: str = None, bv_release_name: str = None,
+         system: System = None):
     # initialise VaultSpeed connection
     logging.basicConfig(level=logging.INFO)
-    auth = UserPasswordAuthentication(api_url=os.environ.get("VS_URL"), username=os.environ.get("VS_USER"), password=os.environ.get("VS_PASSWORD"))
-    client = Client(base_url=os.environ.get("VS_URL"), auth=auth, retries=1, caller="examples")
-    system = System(client=client)
+    if not system:
+        auth = UserPasswordAuthentication(api_url=os.environ.get("VS_URL"), username=os.environ.get("VS_USER"), password=os.environ.get("VS_PASSWORD"))
+        client = Client(base_url=os.environ.get("VS_URL"), auth=auth, retries=1, caller="examples")
+        system = System(client=client)
 
     data_vault = system.get_project(project).get_data_vault(name=dv)
 
@@ -45,15 +56,24 @@ def main(project: str, dv: str, csv_path: Path, dv_release_name: str = None, bv_
         bv_release = get_last(unlocked_bv_releases)
         print(f"Retrieved the last unlocked BV Release: {bv_release.name}")
 
+    # retrieve the objects and the existing signatures once, signatures that don't exist yet are only created once
+    objects = bv_release.objects
+    signature_objects = dict(bv_release.signature_objects.items())
+    signature_attributes = dict(bv_release.signature_attributes.items())
+
+    # group the assignments by object and attribute, so that all signatures of one object or attribute can be set at once
+    object_assignments = defaultdict(dict)
     with open(csv_path / "object_signatures.csv") as csvfile:
         object_signatures = csv.reader(csvfile, delimiter=",")
         for row in object_signatures:
             object_name = row[0]
             signature_name = row[1]
 
-            signature = bv_release.get_signature_object(signature_name, check=False) or bv_release.create_signature_object(name=signature_name)
-            bv_release.objects[object_name].add_signature(signature)
+            if signature_name not in signature_objects:
+                signature_objects[signature_name] = bv_release.create_signature_object(name=signature_name)
+            object_assignments[object_name][signature_name] = signature_objects[signature_name]
 
+    attribute_assignments = defaultdict(lambda: defaultdict(dict))
     with open(csv_path / "attribute_signatures.csv") as csvfile:
         object_signatures = csv.reader(csvfile, delimiter=",")
         for row in object_signatures:
@@ -61,8 +81,17 @@ def main(project: str, dv: str, csv_path: Path, dv_release_name: str = None, bv_
             attribute_name = row[1]
             signature_name = row[2]
 
-            signature = bv_release.get_signature_attribute(signature_name, check=False) or bv_release.create_signature_attribute(name=signature_name)
-            bv_release.objects[object_name].attributes[attribute_name].add_signature(signature)
+            if signature_name not in signature_attributes:
+                signature_attributes[signature_name] = bv_release.create_signature_attribute(name=signature_name)
+            attribute_assignments[object_name][attribute_name][signature_name] = signature_attributes[signature_name]
+
+    for object_name, signatures in object_assignments.items():
+        assign_signatures(objects[object_name], list(signatures.values()))
+
+    for object_name, attribute_signatures in attribute_assignments.items():
+        attributes = objects[object_name].attributes
+        for attribute_name, signatures in attribute_signatures.items():
+            assign_signatures(attributes[attribute_name], list(signatures.values()))
 
 
 if __name__ == "__main__":
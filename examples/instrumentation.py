@@ -0,0 +1,179 @@
+import hashlib
+import json
+import re
+import sys
+import threading
+import time
+from collections import Counter, defaultdict
+from contextlib import contextmanager
+from typing import Callable, Dict, List
+from urllib.parse import urlparse
+
+import requests
+
+"""
+This module collects metrics about the API calls made by the SDK: the latency per endpoint, the number of retries,
+the bytes transferred and the SDK methods that triggered the calls.
+Just like api_replay, it hooks into the transport (requests.Session.send), so both can be combined.
+
+Example:
+
+with profile():
+    generate_code(system, ...)
+"""
+
+# upper bounds (in seconds) of the latency histogram buckets
+BUCKETS = [0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 30, float("inf")]
+IDENTIFIER = re.compile(r"^(\d+|[0-9a-fA-F-]{32,36})$")
+
+
+def endpoint(request: requests.PreparedRequest) -> str:
+    # identifiers in the path are replaced, so that all calls to the same endpoint are grouped together
+    path = "/".join("{id}" if IDENTIFIER.match(part) else part for part in urlparse(request.url).path.split("/"))
+    return f"{request.method} {path}"
+
+
+def response_size(response: requests.Response, stream: bool = False) -> int:
+    # the body of a streamed response (e.g. a generation download) is not read here, its Content-Length is used instead
+    if response is None:
+        return 0
+    if stream:
+        return int(response.headers.get("Content-Length", 0))
+    return len(response.content)
+
+
+def sdk_caller() -> str:
+    # the outermost SDK function on the stack is the method that was called by the script
+    caller = "<unknown>"
+    frame = sys._getframe(1)
+    while frame:
+        module = frame.f_globals.get("__name__", "")
+        if module.startswith("vaultspeed_sdk"):
+            caller = f"{module}.{frame.f_code.co_name}"
+        frame = frame.f_back
+    return caller
+
+
+class EndpointStats:
+    def __init__(self):
+        self.count = 0
+        self.errors = 0
+        self.retries = 0
+        self.duration = 0.0
+        self.bytes_sent = 0
+        self.bytes_received = 0
+        self.buckets = [0] * len(BUCKETS)
+        self.callers = Counter()
+
+    def to_dict(self) -> Dict:
+        return {
+            "count": self.count,
+            "errors": self.errors,
+            "retries": self.retries,
+            "duration": round(self.duration, 3),
+            "bytes_sent": self.bytes_sent,
+            "bytes_received": self.bytes_received,
+            "buckets": dict(zip([str(b) for b in BUCKETS], self.buckets)),
+            "callers": dict(self.callers)
+        }
+
+
+class Instrumentation:
+    def __init__(self):
+        # hooks that are called before and after every API call
+        self.before_request: List[Callable[[requests.PreparedRequest], None]] = []
+        self.after_request: List[Callable[[requests.PreparedRequest, requests.Response, float], None]] = []
+        self.endpoints: Dict[str, EndpointStats] = defaultdict(EndpointStats)
+        self._failed = threading.local()
+        self._lock = threading.Lock()
+        self._original_send = None
+
+    def __enter__(self):
+        self._original_send = requests.Session.send
+        instrumentation = self
+
+        def send(session, request, **kwargs):
+            return instrumentation.send(session, request, **kwargs)
+
+        requests.Session.send = send
+        return self
+
+    def __exit__(self, exc_type, exc_val, exc_tb):
+        requests.Session.send = self._original_send
+
+    def send(self, session, request: requests.PreparedRequest, **kwargs) -> requests.Response:
+        for hook in self.before_request:
+            hook(request)
+
+        body = request.body or b""
+        body = body.encode() if isinstance(body, str) else body
+        # a call that is identical to the previous failed call of this thread is a retry
+        key = f"{request.method} {request.url} {hashlib.sha256(body).hexdigest()}"
+        retry = getattr(self._failed, "key", None) == key
+        caller = sdk_caller()
+
+        start = time.perf_counter()
+        response = None
+        try:
+            response = self._original_send(session, request, **kwargs)
+        finally:
+            duration = time.perf_counter() - start
+            failed = response is None or response.status_code == 429 or response.status_code >= 500
+            self._failed.key = key if failed else None
+
+            with self._lock:
+                stats = self.endpoints[endpoint(request)]
+                stats.count += 1
+                stats.errors += failed
+                stats.retries += retry
+                stats.duration += duration
+                stats.bytes_sent += len(body)
+                stats.bytes_received += response_size(response, kwargs.get("stream", False))
+                stats.buckets[next(i for i, bound in enumerate(BUCKETS) if duration <= bound)] += 1
+                stats.callers[caller] += 1
+
+        for hook in self.after_request:
+            hook(request, response, duration)
+        return response
+
+    def snapshot(self) -> Dict:
+        with self._lock:
+            return {name: stats.to_dict() for name, stats in self.endpoints.items()}
+
+    def to_json(self) -> str:
+        return json.dumps(self.snapshot(), indent=1)
+
+    def to_prometheus(self) -> str:
+        lines = ["# TYPE vaultspeed_sdk_request_duration_seconds histogram"]
+        snapshot = self.snapshot()
+        for name, stats in snapshot.items():
+            cumulative = 0
+            for bound, count in stats["buckets"].items():
+                cumulative += count
+                le = "+Inf" if bound == "inf" else bound
+                lines.append(f'vaultspeed_sdk_request_duration_seconds_bucket{{endpoint="{name}",le="{le}"}} {cumulative}')
+            lines.append(f'vaultspeed_sdk_request_duration_seconds_sum{{endpoint="{name}"}} {stats["duration"]}')
+            lines.append(f'vaultspeed_sdk_request_duration_seconds_count{{endpoint="{name}"}} {stats["count"]}')
+        for metric in ["errors", "retries", "bytes_sent", "bytes_received"]:
+            lines.append(f"# TYPE vaultspeed_sdk_request_{metric}_total counter")
+            for name, stats in snapshot.items():
+                lines.append(f'vaultspeed_sdk_request_{metric}_total{{endpoint="{name}"}} {stats[metric]}')
+        return "\n".join(lines) + "\n"
+
+    def report(self) -> str:
+        lines = [f"{'calls':>7} {'total (s)':>10} {'avg (s)':>8} {'retries':>8}  endpoint (most frequent SDK caller)"]
+        with self._lock:
+            for name, stats in sorted(self.endpoints.items(), key=lambda item: item[1].duration, reverse=True):
+                caller = stats.callers.most_common(1)[0][0]
+                lines.append(f"{stats.count:>7} {stats.duration:>10.2f} {stats.duration / stats.count:>8.3f} {stats.retries:>8}  {name} ({caller})")
+        return "\n".join(lines)
+
+
+@contextmanager
+def profile():
+    # collect the metrics of all the API calls made in this block, and print them afterwards
+    with Instrumentation() as instrumentation:
+        try:
+            yield instrumentation
+        finally:
+            print(instrumentation.report())
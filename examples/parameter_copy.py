@@ -1,35 +1,51 @@
 import argparse
 import os
+from concurrent.futures import ThreadPoolExecutor
+from typing import List
 
 from vaultspeed_sdk.client import Client, UserPasswordAuthentication
 from vaultspeed_sdk.system import System
 
 
-def main(project_a: str, source_a: str, project_b: str, source_b):
-    auth = UserPasswordAuthentication(api_url=os.environ.get("VS_URL"), username=os.environ.get("VS_USER"),
-                                      password=os.environ.get("VS_PASSWORD"))
-    client = Client(base_url=os.environ.get("VS_URL"), auth=auth, retries=1, caller="examples")
-    system = System(client=client)
+def copy_parameters(param_a, param_b, only_diff: bool = True) -> int:
+    # only assign the values that are different, and don't save when nothing changed
+    changed = 0
+    for param in param_a:
+        if only_diff and param_b[param.name].value == param.value:
+            continue
+        param_b[param.name].value = param.value
+        changed += 1
+
+    if changed:
+        param_b.save()
+    return changed
+
+
+def main(project_a: str, source_a: str, project_b: str, sources_b: List[str], max_workers: int = 8, system: System = None):
+    if not system:
+        auth = UserPasswordAuthentication(api_url=os.environ.get("VS_URL"), username=os.environ.get("VS_USER"),
+                                          password=os.environ.get("VS_PASSWORD"))
+        client = Client(base_url=os.environ.get("VS_URL"), auth=auth, retries=1, caller="examples")
+        system = System(client=client)
 
     pa = system.get_project(project_a)
     pb = system.get_project(project_b)
 
     sa = pa.get_source(source_a)
-    sb = pb.get_source(source_b)
-
     param_a = sa.parameters
-    param_b = sb.parameters
 
-    for param in param_a:
-        param_b[param.name].value = param.value
+    # the target sources don't depend on each other, so they are all updated at the same time
+    with ThreadPoolExecutor(max_workers=max_workers) as executor:
+        changed = list(executor.map(lambda source_b: copy_parameters(param_a, pb.get_source(source_b).parameters), sources_b))
 
-    param_b.save()
+    for source_b, count in zip(sources_b, changed):
+        print(f"{source_b}: {count} parameters updated")
 
 
 if __name__ == "__main__":
     parser = argparse.ArgumentParser(
         prog="copy source Parameters",
-        description="Copies the source parameters from one source to another, the sources can be in different projects."
+        description="Copies the source parameters from one source to one or more other sources, the sources can be in different projects."
     )
     parser.add_argument(
         "project_a",
@@ -45,8 +61,17 @@ if __name__ == "__main__":
     )
     parser.add_argument(
         "source_b",
-        help="Name of the Source to copy to"
+        help="Names of the Sources to copy to",
+        nargs="+"
+    )
+    parser.add_argument(
+        "-w", "--workers",
+        help="Maximum number of Sources that are updated at the same time",
+        dest="max_workers",
+        action="store",
+        type=int,
+        default=8
     )
     args = parser.parse_args()
 
-    main(args.project_a, args.source_a, args.project_b, args.source_b)
+    main(args.project_a, args.source_a, args.project_b, args.source_b, args.max_workers)
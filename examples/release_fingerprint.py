@@ -0,0 +1,211 @@
+import argparse
+import hashlib
+import json
+import logging
+import os
+import re
+import sys
+from concurrent.futures import ThreadPoolExecutor
+from pathlib import Path
+from typing import Dict
+
+from vaultspeed_sdk.client import Client, UserPasswordAuthentication
+from vaultspeed_sdk.models.util import get_last
+from vaultspeed_sdk.system import System
+
+from release_snapshot import business_view_rows, object_rows
+
+"""
+This script calculates a fingerprint of a Business Vault release: a hash per object, per business view and per group of settings,
+and one hash for the release as a whole. The hashes only depend on the content of the model, so 2 releases without any
+real differences have the same fingerprint.
+By storing the fingerprint of the release that was last generated, a pipeline can compare it with a new release and skip the
+generation when nothing changed, or see which objects changed. The new fingerprint should only replace the stored one
+once the generation succeeded, otherwise a failed generation would be skipped the next time, e.g.:
+
+python release_fingerprint.py moto moto_sf --previous generated.json --output new.json || \
+    (python generation_setup.py moto moto_sf SNOWFLAKESQL && mv new.json generated.json)
+"""
+
+# identifiers are different in every release, even if the object itself did not change.
+# Only the id or identifier field of the element is removed, references like data_type_id=3 and fields like valid=1 are kept.
+IDENTIFIER = re.compile(r"\b(id|identifier)=\d+,? ?", re.IGNORECASE)
+
+
+def details(row: tuple) -> tuple:
+    # the last column of the snapshot rows is the description of the element as printed by the SDK, only there the identifiers are removed
+    return row[:-1] + (IDENTIFIER.sub("", row[-1]),)
+
+
+def content_hash(value) -> str:
+    return hashlib.sha256(json.dumps(value, sort_keys=True, default=str).encode()).hexdigest()
+
+
+def object_fingerprint(name: str, obj) -> str:
+    obj_row, attributes, object_signatures, attribute_signatures = object_rows(name, obj)
+    return content_hash([details(obj_row), [details(row) for row in attributes], object_signatures, attribute_signatures])
+
+
+def business_view_fingerprint(name: str, view) -> str:
+    view_row, attributes = business_view_rows(name, view)
+    return content_hash([details(view_row), [details(row) for row in attributes]])
+
+
+def fingerprint_release(project, data_vault, dv_release, bv_release, max_workers: int = 8) -> Dict:
+    bv_objects = list(bv_release.objects.items())
+    views = list(bv_release.business_views.items())
+    with ThreadPoolExecutor(max_workers=max_workers) as executor:
+        objects = dict(zip([name for name, _ in bv_objects], executor.map(lambda item: object_fingerprint(*item), bv_objects)))
+        business_views = dict(zip([name for name, _ in views], executor.map(lambda item: business_view_fingerprint(*item), views)))
+
+    links = [(link_type, name, str(link)) for link_type, links in [("link", dv_release.links), ("many_to_many_link", dv_release.many_to_many_links),
+                                                                   ("non_historical_link", dv_release.non_historical_links)]
+             for name, link in links.items()]
+    # the template code itself is hashed as is, so that every edit to a template is seen as a change
+    settings = {
+        "project_parameters": content_hash(sorted((param.name, param.value) for param in project.parameters)),
+        "data_vault_parameters": content_hash(sorted((param.name, param.value) for param in data_vault.parameters)),
+        "templates": content_hash(sorted(details((name, template.template_etl, template.template_ddl, str(template)))
+                                         for name, template in bv_release.templates.items())),
+        "data_types": content_hash(sorted(details((name, str(data_type))) for name, data_type in dv_release.data_types.items())),
+        "data_type_mappings": content_hash(sorted(details((name, str(mapping))) for name, mapping in dv_release.data_type_mappings.items())),
+        "hub_groups": content_hash(sorted((group_name, element.name, element.source_name)
+                                          for group_name, group in dv_release.grouped_hubs.items() for element in group.elements)),
+        "links": content_hash(sorted(details(row) for row in links)),
+    }
+    sections = {"objects": objects, "business_views": business_views, "settings": settings}
+
+    return {
+        "dv_release": dv_release.name,
+        "bv_release": bv_release.name,
+        "fingerprint": content_hash(sections),
+        **sections
+    }
+
+
+def compare_fingerprints(previous: Dict, current: Dict) -> Dict[str, Dict[str, list]]:
+    # per section, the names of the objects, business views or settings that were added, removed or changed
+    changes = {}
+    for section in ["objects", "business_views", "settings"]:
+        old, new = previous[section], current[section]
+        changes[section] = {
+            "added": sorted(new.keys() - old.keys()),
+            "removed": sorted(old.keys() - new.keys()),
+            "changed": sorted(name for name in new.keys() & old.keys() if new[name] != old[name])
+        }
+    return changes
+
+
+def main(project_name: str, dv: str, dv_release_name: str = None, bv_release_name: str = None, previous: Path = None, output: Path = None,
+         max_workers: int = 8, system: System = None) -> bool:
+    # initialise VaultSpeed connection
+    logging.basicConfig(level=logging.INFO)
+    if not system:
+        auth = UserPasswordAuthentication(api_url=os.environ.get("VS_URL"), username=os.environ.get("VS_USER"), password=os.environ.get("VS_PASSWORD"))
+        client = Client(base_url=os.environ.get("VS_URL"), auth=auth, retries=1, caller="examples")
+        system = System(client=client)
+
+    project = system.get_project(project_name)
+    data_vault = project.get_data_vault(name=dv)
+
+    # get requested releases or the last locked ones if none are specified, the same releases as generation_setup uses
+    if dv_release_name:
+        dv_release = data_vault.get_release(dv_release_name)
+        if not dv_release.locked:
+            raise Exception("The selected Data Vault release is not yet locked and thus cannot be used to generate code")
+    else:
+        locked_dv_releases = [rel for rel in data_vault.releases if rel.locked]
+        if not locked_dv_releases:
+            raise Exception("No locked Data Vault releases could be found in the selected project")
+        dv_release = get_last(locked_dv_releases)
+
+    if bv_release_name:
+        bv_release = dv_release.get_business_vault_release(bv_release_name)
+        if not bv_release.locked:
+            raise Exception("The selected Business Vault release is not yet locked and thus cannot be used to generate code")
+    else:
+        locked_bv_releases = [rel for rel in dv_release.business_vault_releases if rel.locked]
+        if not locked_bv_releases:
+            raise Exception("No locked Business Vault releases could be found in the selected DV release")
+        bv_release = get_last(locked_bv_releases)
+    print(f"Fingerprinting DV release {dv_release.name} and BV release {bv_release.name}")
+
+    # the previous fingerprint is read before the new one is written, so both can be the same file
+    previous_fingerprint = json.loads(previous.read_text()) if previous and previous.is_file() else None
+
+    fingerprint = fingerprint_release(project, data_vault, dv_release, bv_release, max_workers)
+    print(f"Fingerprint: {fingerprint['fingerprint']}")
+    if output:
+        output.write_text(json.dumps(fingerprint, indent=1))
+
+    if not previous_fingerprint:
+        print("No previous fingerprint found")
+        return True
+    if previous_fingerprint["fingerprint"] == fingerprint["fingerprint"]:
+        print(f"No changes since DV release {previous_fingerprint['dv_release']} and BV release {previous_fingerprint['bv_release']}")
+        return False
+
+    print(f"Changes since DV release {previous_fingerprint['dv_release']} and BV release {previous_fingerprint['bv_release']}:")
+    for section, changes in compare_fingerprints(previous_fingerprint, fingerprint).items():
+        for k, names in changes.items():
+            for name in names:
+                print(f"  {section} {k}: {name}")
+    return True
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(
+        prog="release fingerprint",
+        description="""
+        This script calculates a fingerprint of the content of a Business Vault release, and compares it with a previous fingerprint.
+        If no releases are specified, then the last locked one will be used, just like in generation_setup.
+        Only store the new fingerprint as the previous one after the generation succeeded.
+        The exit code is 0 when nothing changed compared to the previous fingerprint, so the generation can be skipped,
+        and 1 when there are changes or there is no previous fingerprint yet.
+        """,
+        epilog=""
+    )
+    parser.add_argument(
+        "project",
+        help="Project name",
+    )
+    parser.add_argument(
+        "dv",
+        help="Data Vault name"
+    )
+    parser.add_argument(
+        "-d", "--dv",
+        help="Data Vault release name",
+        dest="dv_release",
+        action="store"
+    )
+    parser.add_argument(
+        "-b", "--bv",
+        help="Business Vault release name",
+        dest="bv_release",
+        action="store"
+    )
+    parser.add_argument(
+        "-p", "--previous",
+        help="JSON file with the fingerprint of the release that was last generated, it is fine if it doesn't exist yet",
+        dest="previous",
+        type=Path
+    )
+    parser.add_argument(
+        "-o", "--output",
+        help="Store the fingerprint in this JSON file, use it as the previous fingerprint once the generation succeeded",
+        dest="output",
+        type=Path
+    )
+    parser.add_argument(
+        "-w", "--workers",
+        help="Maximum number of concurrent API requests",
+        dest="max_workers",
+        action="store",
+        type=int,
+        default=8
+    )
+    args = parser.parse_args()
+
+    changed = main(args.project, args.dv, args.dv_release, args.bv_release, args.previous, args.output, args.max_workers)
+    sys.exit(1 if changed else 0)
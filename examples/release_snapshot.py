@@ -0,0 +1,172 @@
+import argparse
+import logging
+import os
+import sqlite3
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime, timezone
+from pathlib import Path
+
+from vaultspeed_sdk.client import Client, UserPasswordAuthentication
+from vaultspeed_sdk.models.util import get_last
+from vaultspeed_sdk.system import System
+
+"""
+This script stores a snapshot of a Business Vault release, together with the Data Vault release it is based on, in a SQLite file.
+The snapshot can then be queried locally (e.g. with the sqlite3 command line tool or load_snapshot), which is a lot faster
+for impact analysis, audits or comparing releases than walking through all the objects over the API.
+Besides the names, the details column contains the full description of each element as it is printed by the SDK.
+The relationships of the Data Vault are stored as its links. Source relationships are not part of the snapshot,
+since they belong to the releases of each source rather than to the Data Vault release.
+"""
+
+TABLES = {
+    "release": ["key", "value"],
+    "objects": ["name", "details"],
+    "attributes": ["object_name", "name", "details"],
+    "object_signatures": ["object_name", "signature_name"],
+    "attribute_signatures": ["object_name", "attribute_name", "signature_name"],
+    "business_views": ["name", "business_name", "generate", "details"],
+    "business_view_attributes": ["business_view_name", "name", "business_name", "generate", "details"],
+    "hub_groups": ["group_name", "hub_name", "source_name"],
+    "links": ["link_type", "name", "details"],
+    "data_types": ["name", "details"],
+    "data_type_mappings": ["name", "details"],
+    "templates": ["name", "template_etl", "template_ddl", "details"],
+}
+
+
+def object_rows(name: str, obj):
+    obj_attributes = obj.attributes
+    attributes = [(name, attr_name, str(attr)) for attr_name, attr in obj_attributes.items()]
+    object_signatures = [(name, signature.name) for signature in obj.signatures]
+    attribute_signatures = [(name, attr_name, signature.name) for attr_name, attr in obj_attributes.items() for signature in attr.signatures]
+    return (name, str(obj)), attributes, object_signatures, attribute_signatures
+
+
+def business_view_rows(name: str, view):
+    attributes = [(name, attr_name, attr.business_name, attr.generate, str(attr)) for attr_name, attr in view.attributes.items()]
+    return (name, view.business_name, view.generate, str(view)), attributes
+
+
+def export_snapshot(dv_release, bv_release, path: Path, max_workers: int = 8):
+    rows = {table: [] for table in TABLES}
+    rows["release"] = [
+        ("dv_release", dv_release.name),
+        ("bv_release", bv_release.name),
+        ("bv_identifier", str(bv_release.identifier)),
+        ("exported_at", datetime.now(timezone.utc).isoformat()),
+    ]
+
+    # the attributes and signatures have to be retrieved per object, so those are retrieved concurrently
+    with ThreadPoolExecutor(max_workers=max_workers) as executor:
+        for obj, attributes, object_signatures, attribute_signatures in executor.map(lambda item: object_rows(*item),
+                                                                                     bv_release.objects.items()):
+            rows["objects"].append(obj)
+            rows["attributes"] += attributes
+            rows["object_signatures"] += object_signatures
+            rows["attribute_signatures"] += attribute_signatures
+
+        for view, attributes in executor.map(lambda item: business_view_rows(*item), bv_release.business_views.items()):
+            rows["business_views"].append(view)
+            rows["business_view_attributes"] += attributes
+
+    for group_name, group in dv_release.grouped_hubs.items():
+        rows["hub_groups"] += [(group_name, element.name, element.source_name) for element in group.elements]
+    for link_type, links in [("link", dv_release.links), ("many_to_many_link", dv_release.many_to_many_links),
+                             ("non_historical_link", dv_release.non_historical_links)]:
+        rows["links"] += [(link_type, name, str(link)) for name, link in links.items()]
+    rows["data_types"] = [(name, str(data_type)) for name, data_type in dv_release.data_types.items()]
+    rows["data_type_mappings"] = [(name, str(mapping)) for name, mapping in dv_release.data_type_mappings.items()]
+    rows["templates"] = [(name, template.template_etl, template.template_ddl, str(template)) for name, template in bv_release.templates.items()]
+
+    path.unlink(missing_ok=True)
+    with sqlite3.connect(path) as con:
+        for table, columns in TABLES.items():
+            con.execute(f"CREATE TABLE {table} ({', '.join(columns)})")
+            con.executemany(f"INSERT INTO {table} VALUES ({', '.join('?' * len(columns))})", rows[table])
+        con.execute("CREATE INDEX attributes_object ON attributes (object_name)")
+        con.execute("CREATE INDEX attribute_signatures_object ON attribute_signatures (object_name)")
+    con.close()
+
+    print(f"Stored {len(rows['objects'])} objects and {len(rows['attributes'])} attributes of {bv_release.name} in {path}")
+
+
+def load_snapshot(path: Path) -> sqlite3.Connection:
+    # open the snapshot read-only, and let SQLite memory-map the file instead of reading it into its own cache
+    con = sqlite3.connect(f"file:{path}?mode=ro", uri=True)
+    con.execute(f"PRAGMA mmap_size = {path.stat().st_size}")
+    return con
+
+
+def main(project: str, dv: str, path: Path, dv_release_name: str = None, bv_release_name: str = None, max_workers: int = 8,
+         system: System = None):
+    # initialise VaultSpeed connection
+    logging.basicConfig(level=logging.INFO)
+    if not system:
+        auth = UserPasswordAuthentication(api_url=os.environ.get("VS_URL"), username=os.environ.get("VS_USER"), password=os.environ.get("VS_PASSWORD"))
+        client = Client(base_url=os.environ.get("VS_URL"), auth=auth, retries=1, caller="examples")
+        system = System(client=client)
+
+    data_vault = system.get_project(project).get_data_vault(name=dv)
+
+    # get requested releases or the latest one if none are specified
+    if dv_release_name:
+        dv_release = data_vault.get_release(dv_release_name)
+    else:
+        dv_release = get_last(data_vault.releases)
+    print(f"Exporting DV release: {dv_release.name}")
+
+    if bv_release_name:
+        bv_release = dv_release.get_business_vault_release(bv_release_name)
+    else:
+        bv_release = get_last(dv_release.business_vault_releases)
+    print(f"Exporting BV release: {bv_release.name}")
+
+    export_snapshot(dv_release, bv_release, path, max_workers)
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(
+        prog="release snapshot",
+        description="""
+        This script stores a snapshot of a Business Vault release and its Data Vault release in a SQLite file,
+        so that it can be queried locally. If no releases are specified, then the last one will be used.
+        """,
+        epilog=""
+    )
+    parser.add_argument(
+        "project",
+        help="Project name",
+    )
+    parser.add_argument(
+        "dv",
+        help="Data Vault name"
+    )
+    parser.add_argument(
+        "path",
+        help="path of the SQLite file to store the snapshot in, an existing file will be overwritten",
+        type=Path
+    )
+    parser.add_argument(
+        "-d", "--dv",
+        help="Data Vault release name",
+        dest="dv_release",
+        action="store"
+    )
+    parser.add_argument(
+        "-b", "--bv",
+        help="Business Vault release name",
+        dest="bv_release",
+        action="store"
+    )
+    parser.add_argument(
+        "-w", "--workers",
+        help="Maximum number of concurrent API requests",
+        dest="max_workers",
+        action="store",
+        type=int,
+        default=8
+    )
+    args = parser.parse_args()
+
+    main(args.project, args.dv, args.path, args.dv_release, args.bv_release, args.max_workers)
@@ -0,0 +1,151 @@
+import argparse
+import json
+import logging
+import os
+import re
+from pathlib import Path
+from typing import Dict, Iterator, List
+
+from vaultspeed_sdk.client import Client, UserPasswordAuthentication
+from vaultspeed_sdk.system import System
+
+"""
+This script harvests the metadata of a source again and selects the source objects based on name patterns.
+Instead of selecting every object in the source on each harvest, only the objects that were added since the previous harvest
+are selected or deselected, so the number of API calls depends on the size of the change and not on the size of the schema.
+The objects are selected in batches, which keeps the requests small for sources with tens of thousands of tables.
+
+The objects of the previous harvest are stored in a local state file, which is only updated once all objects were selected.
+A dry run or a failed selection therefore doesn't lose track of the new objects, they are picked up again by the next run.
+Without a state file, the objects that are currently stored in VaultSpeed are used as the previous harvest.
+
+The patterns use the same syntax as source.exclude_object: % matches any number of characters and _ matches a single character.
+"""
+
+
+def like(pattern: str) -> re.Pattern:
+    return re.compile("".join(".*" if c == "%" else "." if c == "_" else re.escape(c) for c in pattern), re.IGNORECASE)
+
+
+def matches(name: str, patterns: List[re.Pattern]) -> bool:
+    return any(pattern.fullmatch(name) for pattern in patterns)
+
+
+def diff_source_objects(previous: Dict[str, object], current: Dict[str, object]) -> Dict[str, List[str]]:
+    # the details of an object as printed by the SDK are compared to find the objects that changed, the previous objects can be those details
+    return {
+        "added": sorted(current.keys() - previous.keys()),
+        "removed": sorted(previous.keys() - current.keys()),
+        "changed": sorted(name for name in current.keys() & previous.keys() if str(current[name]) != str(previous[name]))
+    }
+
+
+def batches(items: list, size: int) -> Iterator[list]:
+    for i in range(0, len(items), size):
+        yield items[i:i + size]
+
+
+def main(project: str, source_name: str, include: List[str], exclude: List[str], all_objects: bool = False, batch_size: int = 1000,
+         dry_run: bool = False, state_path: Path = None, system: System = None):
+    # initialise VaultSpeed connection
+    logging.basicConfig(level=logging.INFO)
+    if not system:
+        auth = UserPasswordAuthentication(api_url=os.environ.get("VS_URL"), username=os.environ.get("VS_USER"), password=os.environ.get("VS_PASSWORD"))
+        client = Client(base_url=os.environ.get("VS_URL"), auth=auth, retries=1, caller="examples")
+        system = System(client=client)
+
+    source = system.get_project(project).get_source(source_name)
+
+    state_path = state_path or Path(f"{project}_{source_name}_harvest.json")
+    if state_path.is_file():
+        previous = json.loads(state_path.read_text())
+    else:
+        # the objects of the last harvest are still stored in VaultSpeed, so they can be retrieved without starting the agent,
+        # they are saved before harvesting again since the new harvest replaces them
+        previous = {src_obj.name: str(src_obj) for src_obj in source.get_source_objects()}
+        state_path.write_text(json.dumps(previous, indent=1))
+    current = {src_obj.name: src_obj for src_obj in source.get_source_objects(refresh=True)}
+    diff = diff_source_objects(previous, current)
+    for k, names in diff.items():
+        print(f"{k}: {len(names)}")
+        for name in names:
+            print(f"  {name}")
+
+    names = sorted(current) if all_objects else diff["added"]
+    include = [like(pattern) for pattern in include or ["%"]]
+    exclude = [like(pattern) for pattern in exclude or []]
+    selected = {name for name in names if matches(name, include) and not matches(name, exclude)}
+    deselected = [current[name] for name in names if name not in selected]
+    selected = [current[name] for name in names if name in selected]
+    print(f"Selecting {len(selected)} and deselecting {len(deselected)} source objects")
+    if dry_run:
+        return
+
+    for objects, select in [(selected, True), (deselected, False)]:
+        for batch in batches(objects, batch_size):
+            source.select_source_objects(batch, selected=select)
+
+    state_path.write_text(json.dumps({name: str(src_obj) for name, src_obj in current.items()}, indent=1))
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(
+        prog="source harvest",
+        description="""
+        This script harvests the metadata of a source again, shows which objects were added, removed or changed,
+        and selects the new objects that match the include patterns and none of the exclude patterns.
+        """,
+        epilog=""
+    )
+    parser.add_argument(
+        "project",
+        help="Project name",
+    )
+    parser.add_argument(
+        "source",
+        help="Source name"
+    )
+    parser.add_argument(
+        "-i", "--include",
+        help="Pattern of the objects to select, e.g. 'sales_%%', all objects are selected when no pattern is given",
+        dest="include",
+        action="append"
+    )
+    parser.add_argument(
+        "-e", "--exclude",
+        help="Pattern of the objects to deselect, e.g. 'jrn_%%'",
+        dest="exclude",
+        action="append"
+    )
+    parser.add_argument(
+        "-a", "--all",
+        help="Apply the patterns to all objects instead of only the ones added since the previous harvest",
+        dest="all_objects",
+        action="store_true",
+        default=False
+    )
+    parser.add_argument(
+        "-s", "--batch-size",
+        help="Maximum number of objects per selection request",
+        dest="batch_size",
+        action="store",
+        type=int,
+        default=1000
+    )
+    parser.add_argument(
+        "-n", "--dry-run",
+        help="Only show the changes, without selecting any objects",
+        dest="dry_run",
+        action="store_true",
+        default=False
+    )
+    parser.add_argument(
+        "--state",
+        help="JSON file with the objects of the previous harvest, defaults to <project>_<source>_harvest.json",
+        dest="state_path",
+        action="store",
+        type=Path
+    )
+    args = parser.parse_args()
+
+    main(args.project, args.source, args.include, args.exclude, args.all_objects, args.batch_size, args.dry_run, args.state_path)
@@ -1,8 +1,13 @@
 import argparse
+import hashlib
 import logging
 import os
+import time
+from concurrent.futures import ThreadPoolExecutor
 from pathlib import Path
+from typing import Dict, List
 
+from generation_setup import deploy_generations
 from vaultspeed_sdk.client import Client, UserPasswordAuthentication
 from vaultspeed_sdk.models.metadata.etl_generation_type import EtlGenerationTypes
 from vaultspeed_sdk.models.util import get_last
@@ -10,10 +15,55 @@ from vaultspeed_sdk.system import System
 
 """
 This script can upload a new version of a template and generate example code for it.
+In watch mode, the script keeps running and tests the template again every time the file is saved, reusing the same session and releases.
 """
 
-def main(project: str, dv: str, template_path: Path, object_name: str, generation_type: EtlGenerationTypes,
-         dv_release_name: str = None, bv_release_name: str = None, deploy_link: str = None):
+
+def test_template(system: System, bv_release, template_path: Path, object_names: List[str], generation_type: EtlGenerationTypes,
+                  db_link=None, examples: Dict = None, max_workers: int = 4):
+    template_text = template_path.read_text()
+    template_file_name = template_path.stem
+
+    # only upload the template when it is different from the one in VaultSpeed
+    if template_file_name.endswith("_ddl"):
+        template = bv_release.get_template(template_file_name.rstrip("_ddl"), check=False)
+        if template.template_ddl != template_text:
+            template.template_ddl = template_text
+    else:
+        template = bv_release.get_template(template_file_name.rstrip("_etl"), check=False)
+        if template.template_etl != template_text:
+            template.template_etl = template_text
+
+    # the example code depends on both the ETL and the DDL part of the template, so both are part of the cache key
+    template_hash = hashlib.sha256(f"{template.template_etl or ''}\0{template.template_ddl or ''}".encode()).hexdigest()
+
+    # the example code is cached for each version of the template, so unchanged combinations don't have to be generated again
+    examples = {} if examples is None else examples
+    keys = {object_name: (template.name, template_hash, object_name, generation_type) for object_name in object_names}
+    new_objects = [object_name for object_name in object_names if keys[object_name] not in examples]
+    if new_objects:
+        dependencies = template.dependencies
+        with ThreadPoolExecutor(max_workers=min(max_workers, len(new_objects))) as executor:
+            results = executor.map(lambda object_name: system.generate_template_example(bv_release=bv_release, template=template,
+                                                                                        base_object=dependencies[object_name],
+                                                                                        etl_type=generation_type), new_objects)
+            for object_name, result in zip(new_objects, results):
+                examples[keys[object_name]] = result
+
+    for object_name in object_names:
+        example_code, generations = examples[keys[object_name]]
+        print(example_code)
+
+        with Path(f"{template.name}_result_{object_name}").open(mode="w") as f:
+            f.write(example_code)
+
+        if db_link and object_name in new_objects:
+            # deploy the generated files
+            deploy_generations(generations, db_link=db_link)
+
+
+def main(project: str, dv: str, template_path: Path, object_names: List[str], generation_type: EtlGenerationTypes,
+         dv_release_name: str = None, bv_release_name: str = None, deploy_link: str = None, watch: bool = False, max_workers: int = 4):
     # initialise VaultSpeed connection
     logging.basicConfig(level=logging.INFO)
     auth = UserPasswordAuthentication(api_url=os.environ.get("VS_URL"), username=os.environ.get("VS_USER"), password=os.environ.get("VS_PASSWORD"))
@@ -48,29 +98,27 @@ def main(project: str, dv: str, template_path: Path, object_name: str, generatio
         bv_release = get_last(locked_bv_releases)
         print(f"Retrieved the last locked BV Release: {bv_release.name}")
 
-    template_file_name = template_path.stem
-
-    if template_file_name.endswith("_ddl"):
-        template = bv_release.get_template(template_file_name.rstrip("_ddl"), check=False)
-        template.template_ddl = template_path.read_text()
-    else:
-        template = bv_release.get_template(template_file_name.rstrip("_etl"), check=False)
-        template.template_etl = template_path.read_text()
-
-    example_code, generations = system.generate_template_example(bv_release=bv_release, template=template,
-                                                                 base_object=template.dependencies[object_name],
-                                                                 etl_type=generation_type)
-    print(example_code)
+    db_link = system.get_database_link(deploy_link) if deploy_link else None
+    examples = {}
+    test_template(system, bv_release, template_path, object_names, generation_type, db_link, examples, max_workers)
 
-    with Path(f"{template.name}_result_{object_name}").open(mode="w") as f:
-        f.write(example_code)
-
-    if deploy_link:
-        # deploy the generated files
-        db_link = system.get_database_link(deploy_link)
-        for gen in generations:
-            if gen.can_autodeploy:
-                gen.deploy_to_target(db_link=db_link)
+    if watch:
+        print(f"Watching {template_path} for changes, press Ctrl+C to stop")
+        last_modified = template_path.stat().st_mtime
+        try:
+            while True:
+                time.sleep(1)
+                modified = template_path.stat().st_mtime
+                if modified == last_modified:
+                    continue
+                last_modified = modified
+                try:
+                    test_template(system, bv_release, template_path, object_names, generation_type, db_link, examples, max_workers)
+                except Exception as e:
+                    # keep watching, the next save might fix the issue
+                    print(e)
+        except KeyboardInterrupt:
+            pass
 
 
 if __name__ == "__main__":
@@ -98,18 +146,18 @@ if __name__ == "__main__":
         choices=[i.name for i in EtlGenerationTypes]
     )
     parser.add_argument(
-        "template",
+        "template_path",
+        metavar="template",
         help="path to the template file",
-        dest="template_path",
         action="store",
         type=Path
     )
     parser.add_argument(
-        "object",
-        help="name of the object to generate for",
-        dest="object_name",
+        "object_names",
+        metavar="object",
+        help="names of the objects to generate for",
         action="store",
-        type=Path
+        nargs="+"
     )
     parser.add_argument(
         "-l", "--deploy", "--link",
@@ -120,23 +168,39 @@ if __name__ == "__main__":
     parser.add_argument(
         "-d", "--dv",
         help="Data Vault release name",
-        dest="dv_release_number",
+        dest="dv_release_name",
         action="store"
     )
     parser.add_argument(
         "-b", "--bv",
         help="Business Vault release name",
-        dest="bv_release_number",
+        dest="bv_release_name",
         action="store"
     )
+    parser.add_argument(
+        "-W", "--watch",
+        help="Keep running and test the template again every time the file is saved",
+        dest="watch",
+        action="store_true",
+        default=False
+    )
+    parser.add_argument(
+        "-w", "--workers",
+        help="Maximum number of example generations that run at the same time",
+        dest="max_workers",
+        action="store",
+        type=int,
+        default=4
+    )
     args = parser.parse_args()
 
-    main(args.project, args.dv, args.template_path, args.object_name, EtlGenerationTypes[args.generation_type], args.dv_release_name,
-         args.bv_release_name, args.deploy_link)
+    main(args.project, args.dv, args.template_path, args.object_names, EtlGenerationTypes[args.generation_type], args.dv_release_name,
+         args.bv_release_name, args.deploy_link, args.watch, args.max_workers)
 
 
 """
 This script can be called from VS Code in order to quickly test a template you are working on, create the following launch configuration in launch.json:
+(add "--watch" or "-W" to the args to keep the script running, it will then test the template again every time you save it)
 
 // Use IntelliSense to learn about possible attributes.
 // Hover to view descriptions of existing attributes.